@@ -1,8 +1,41 @@
 import os
 import json
 import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from extractor import process_pdf_file
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+def _process_one(input_path, output_path):
+    """
+    Processes a single PDF in a worker process and writes its JSON output.
+    Returns (filename, elapsed_seconds, error_message_or_None).
+    """
+    filename = os.path.basename(input_path)
+    start_time = time.time()
+
+    try:
+        # Call the core logic from the extractor module.
+        result_data = process_pdf_file(input_path)
+
+        # Write the structured data to the output JSON file. orjson
+        # serializes straight to UTF-8 bytes at C speed; the stdlib json
+        # fallback uses ensure_ascii=False to match its handling of
+        # multilingual characters.
+        if orjson is not None:
+            with open(output_path, 'wb') as f:
+                f.write(orjson.dumps(result_data, option=orjson.OPT_INDENT_2))
+        else:
+            with open(output_path, 'w', encoding='utf-8') as f:
+                json.dump(result_data, f, indent=2, ensure_ascii=False)
+
+        return filename, time.time() - start_time, None
+    except Exception as e:
+        return filename, time.time() - start_time, str(e)
+
 def main():
     """
     Orchestrates the processing of all PDF files in the input directory.
@@ -22,35 +55,30 @@ def main():
 
     print(f"Starting document processing from '{input_dir}'...")
 
-    # Process each file in the input directory.
-    for filename in os.listdir(input_dir):
-        if filename.lower().endswith('.pdf'):
-            input_path = os.path.join(input_dir, filename)
-            output_filename = os.path.splitext(filename)[0] + '.json'
-            output_path = os.path.join(output_dir, output_filename)
-
-            print(f"Processing '{filename}'...")
-            start_time = time.time()
-
-            try:
-                # Call the core logic from the extractor module.
-                result_data = process_pdf_file(input_path)
+    # Each PDF is independent and CPU-bound, so dispatch files to a pool of
+    # worker processes instead of looping sequentially.
+    max_workers = min(os.cpu_count() or 1, 4)
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = []
+        # scandir yields DirEntry objects whose is_file() usually answers
+        # from the directory listing itself, without a stat per entry.
+        with os.scandir(input_dir) as entries:
+            for entry in entries:
+                if entry.is_file() and entry.name.lower().endswith('.pdf'):
+                    output_filename = os.path.splitext(entry.name)[0] + '.json'
+                    output_path = os.path.join(output_dir, output_filename)
+                    futures.append(executor.submit(_process_one, entry.path, output_path))
 
-                # Write the structured data to the output JSON file.
-                # We use ensure_ascii=False to correctly handle multilingual characters.
-                with open(output_path, 'w', encoding='utf-8') as f:
-                    json.dump(result_data, f, indent=2, ensure_ascii=False)
-
-                end_time = time.time()
-                print(f"Successfully created '{output_filename}' in {end_time - start_time:.2f} seconds.")
-
-            except Exception as e:
-                end_time = time.time()
-                print(f"Error processing '{filename}': {e}")
-                print(f"Failed in {end_time - start_time:.2f} seconds.")
+        for future in as_completed(futures):
+            filename, elapsed, error = future.result()
+            if error is None:
+                output_filename = os.path.splitext(filename)[0] + '.json'
+                print(f"Successfully created '{output_filename}' in {elapsed:.2f} seconds.")
+            else:
+                print(f"Error processing '{filename}': {error}")
+                print(f"Failed in {elapsed:.2f} seconds.")
 
     print("All documents processed.")
 
 if __name__ == "__main__":
     main()
-